@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Unit tests for trace_parser module.
+"""
+
+import json
+import os
+import random
+import tempfile
+import unittest
+from trace_parser import TraceParser
+
+
+def _span(span_id, name, timestamp, duration, parent_id=None, tags=None, trace_id='trace-1'):
+    """Build a Zipkin span; times are in microseconds."""
+    span = {
+        'traceId': trace_id,
+        'id': span_id,
+        'name': name,
+        'timestamp': timestamp,
+        'duration': duration,
+        'localEndpoint': {'serviceName': 'subscription-killer'},
+    }
+    if parent_id is not None:
+        span['parentId'] = parent_id
+    if tags is not None:
+        span['tags'] = tags
+    return span
+
+
+def _merged_length(intervals):
+    """Brute-force union length: merge sorted intervals one by one."""
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def _reference_token_usage(traces):
+    """Per-span token count, as get_ai_token_usage computed it before the load-time columns."""
+    results = []
+    for trace in traces:
+        if not any('http' in span.get('name', '').lower() and 'benchmark/analyze' in span.get('name', '').lower()
+                   for span in trace):
+            continue
+
+        counts = {
+            'gen_ai.usage.total_tokens': 0,
+            'gen_ai.usage.input_tokens': 0,
+            'gen_ai.usage.output_tokens': 0,
+        }
+        for span in trace:
+            if 'name' in span and 'tags' in span and span['name'].lower().startswith('chat'):
+                for tag in counts:
+                    if tag in span['tags']:
+                        try:
+                            counts[tag] += int(span['tags'][tag])
+                        except (ValueError, TypeError):
+                            break
+
+        results.append({
+            'trace_id': trace[0].get('traceId', '') if trace else '',
+            'total_tokens': counts['gen_ai.usage.total_tokens'],
+            'input_tokens': counts['gen_ai.usage.input_tokens'],
+            'output_tokens': counts['gen_ai.usage.output_tokens'],
+            'ai_spans_with_tokens': len([
+                span for span in trace
+                if 'name' in span and 'tags' in span and span['name'].lower().startswith('chat')
+                and 'gen_ai.usage.total_tokens' in span['tags']
+            ])
+        })
+    return results
+
+
+class TestTraceParser(unittest.TestCase):
+    """Unit tests for TraceParser class."""
+
+    def setUp(self):
+        """Set up a temporary directory for trace files."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up the temporary directory."""
+        self.temp_dir.cleanup()
+
+    def _parser(self, traces, warmup_iterations=0):
+        """Write traces in the raw Zipkin export format and parse them."""
+        path = os.path.join(self.temp_dir.name, 'traces.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'rawData': json.dumps(traces)}, f)
+        return TraceParser(path, warmup_iterations)
+
+    def test_repeated_root_id_counts_once(self):
+        """Test that a root span reported twice under the same id is aggregated once."""
+        parser = self._parser([[
+            _span('root', 'http post /benchmark/analyze', 0, 1_000_000),
+            _span('root', 'http post /benchmark/analyze', 2_000_000, 1_000_000),
+            _span('chat', 'chat gpt-4o', 100_000, 300_000, parent_id='root'),
+        ]])
+
+        self.assertEqual(parser._get_critical_io_by_pattern('chat')[0]['critical_io_ms'], 300.0)
+        self.assertEqual(parser._get_unified_critical_io()[0]['critical_io_ms'], 300.0)
+
+    def test_single_critical_child_under_longer_root(self):
+        """Test that one critical child under a longer non-critical root counts once."""
+        parser = self._parser([[
+            _span('root', 'http post /benchmark/analyze', 1_000_000, 1_000_000),
+            _span('chat', 'chat gpt-4o', 1_100_000, 300_000, parent_id='root'),
+        ]])
+
+        result = parser._calculate_critical_io_for_pattern('chat')[0]
+
+        self.assertEqual(result['critical_io_ms'], 300.0)
+        self.assertEqual(result['spans_count'], 1)
+        self.assertEqual(result['final_spans_count'], 1)
+        self.assertEqual(result['execution_pattern'], 'single_span')
+
+        # The recursive and union-interval methods agree on the same trace
+        self.assertEqual(parser._get_critical_io_by_pattern('chat')[0]['critical_io_ms'], 300.0)
+        self.assertEqual(parser.get_ai_api_critical_io()[0]['critical_io_ms'], 300.0)
+
+    def test_single_critical_span_nested_below_non_critical_spans(self):
+        """Test that a critical span counts once however deep it is nested."""
+        parser = self._parser([[
+            _span('root', 'http post /benchmark/analyze', 1_000_000, 1_000_000),
+            _span('service', 'analyze emails', 1_050_000, 800_000, parent_id='root'),
+            _span('chat', 'chat gpt-4o', 1_100_000, 300_000, parent_id='service'),
+        ]])
+
+        result = parser._calculate_critical_io_for_pattern('chat')[0]
+
+        self.assertEqual(result['critical_io_ms'], 300.0)
+        self.assertEqual(result['final_spans_count'], 1)
+
+    def test_sequential_and_concurrent_critical_children(self):
+        """Test that sequential critical children are summed and concurrent ones take the max."""
+        sequential = [
+            _span('root', 'http post /benchmark/analyze', 0, 1_000_000),
+            _span('a', 'gmail list', 100_000, 200_000, parent_id='root'),
+            _span('b', 'gmail get', 400_000, 300_000, parent_id='root'),
+        ]
+        concurrent = [
+            _span('root', 'http post /benchmark/analyze', 0, 1_000_000, trace_id='trace-2'),
+            _span('a', 'gmail list', 100_000, 200_000, parent_id='root', trace_id='trace-2'),
+            _span('b', 'gmail get', 150_000, 300_000, parent_id='root', trace_id='trace-2'),
+        ]
+        parser = self._parser([sequential, concurrent])
+
+        by_level = [entry['critical_io_ms'] for entry in parser._calculate_critical_io_for_pattern('gmail')]
+        recursive = [entry['critical_io_ms'] for entry in parser._get_critical_io_by_pattern('gmail')]
+
+        self.assertEqual(by_level, [500.0, 300.0])
+        self.assertEqual(recursive, [500.0, 300.0])
+
+    def test_union_duration_matches_brute_force_merge(self):
+        """Test _union_duration against merging the intervals one by one."""
+        parser = self._parser([])
+        rng = random.Random(42)
+
+        for _ in range(200):
+            count = rng.randint(1, 12)
+            starts = [rng.randint(0, 5_000) for _ in range(count)]
+            ends = [start + rng.randint(0, 1_500) for start in starts]
+
+            self.assertEqual(
+                parser._union_duration(starts, ends),
+                _merged_length(list(zip(starts, ends)))
+            )
+
+        self.assertEqual(parser._union_duration([], []), 0)
+
+    def test_union_interval_critical_io_matches_brute_force_merge(self):
+        """Test the union-interval critical I/O of random traces against a brute-force merge."""
+        rng = random.Random(7)
+        traces = []
+        for trace_index in range(20):
+            trace_id = f'trace-{trace_index}'
+            base = 1_700_000_000_000_000 + trace_index * 10_000_000
+            trace = [_span('root', 'http post /benchmark/analyze', base, 8_000_000, trace_id=trace_id)]
+            for span_index in range(rng.randint(1, 10)):
+                name = rng.choice(['gmail get', 'chat gpt-4o', 'parse email'])
+                trace.append(_span(
+                    f's{span_index}', name, base + rng.randint(0, 5_000_000), rng.randint(1, 2_000_000),
+                    parent_id='root', trace_id=trace_id
+                ))
+            traces.append(trace)
+        parser = self._parser(traces)
+
+        for patterns, results in (
+            (('gmail',), parser.get_gmail_api_critical_io()),
+            (('chat',), parser.get_ai_api_critical_io()),
+            (('gmail', 'chat'), parser.get_total_critical_io()),
+        ):
+            for trace, result in zip(traces, results):
+                intervals = [
+                    (span['timestamp'], span['timestamp'] + span['duration'])
+                    for span in trace if span['name'].startswith(patterns)
+                ]
+                self.assertEqual(result['spans_count'], len(intervals))
+                self.assertEqual(result['critical_io_ms'], _merged_length(intervals) / 1000)
+
+    def test_token_usage_matches_per_span_count(self):
+        """Test get_ai_token_usage against counting the tags span by span."""
+        traces = [
+            [
+                _span('root', 'http post /benchmark/analyze', 0, 1_000_000),
+                _span('c1', 'chat gpt-4o', 10, 100, parent_id='root', tags={
+                    'gen_ai.usage.total_tokens': '150',
+                    'gen_ai.usage.input_tokens': '100',
+                    'gen_ai.usage.output_tokens': '50',
+                }),
+                _span('c2', 'Chat gpt-4o', 200, 100, parent_id='root', tags={
+                    'gen_ai.usage.total_tokens': 30,
+                    'gen_ai.usage.input_tokens': 20,
+                    'gen_ai.usage.output_tokens': 10,
+                }),
+                # A malformed count ends this span's contribution
+                _span('c3', 'chat gpt-4o', 400, 100, parent_id='root', tags={
+                    'gen_ai.usage.total_tokens': '7',
+                    'gen_ai.usage.input_tokens': 'n/a',
+                    'gen_ai.usage.output_tokens': '3',
+                }),
+                _span('c4', 'chat gpt-4o', 600, 100, parent_id='root', tags={
+                    'gen_ai.usage.input_tokens': '5',
+                }),
+                _span('c5', 'chat gpt-4o', 700, 100, parent_id='root', tags={}),
+                _span('c6', 'chat gpt-4o', 800, 100, parent_id='root'),
+                _span('g1', 'gmail get', 900, 100, parent_id='root', tags={
+                    'gen_ai.usage.total_tokens': '999',
+                }),
+            ],
+            [
+                _span('other', 'http get /health', 0, 1_000, trace_id='trace-2'),
+                _span('c7', 'chat gpt-4o', 10, 100, parent_id='other', trace_id='trace-2', tags={
+                    'gen_ai.usage.total_tokens': '42',
+                }),
+            ],
+        ]
+        parser = self._parser(traces)
+
+        usage = parser.get_ai_token_usage()
+
+        self.assertEqual(usage, _reference_token_usage(traces))
+        self.assertEqual(usage[0]['total_tokens'], 187)
+        self.assertEqual(usage[0]['input_tokens'], 125)
+        self.assertEqual(usage[0]['output_tokens'], 60)
+        self.assertEqual(usage[0]['ai_spans_with_tokens'], 3)
+
+    def test_prefix_filters_ignore_case(self):
+        """Test that chat and gmail spans are matched by case-insensitive name prefix."""
+        names = ['http post /benchmark/analyze', 'chat gpt-4o', 'Chat GPT-4o', 'CHAT summary',
+                 'gmail get', 'GMAIL list', 'parse chat reply', 'email gmail sync']
+        trace = [_span('root', names[0], 0, 1_000_000)] + [
+            _span(f's{index}', name, index * 1_000, 500, parent_id='root')
+            for index, name in enumerate(names[1:], 1)
+        ]
+        parser = self._parser([trace])
+
+        for pattern in ('chat', 'gmail'):
+            expected = [name for name in names if name.lower().startswith(pattern)]
+            self.assertEqual([span.span_name for span in parser._get_critical_spans([pattern])], expected)
+            self.assertEqual([span.span_name for span in parser._filter_spans_by_pattern(pattern)], expected)
+
+        self.assertEqual(parser.get_ai_api_critical_io()[0]['spans_count'], 3)
+
+    def test_warmup_traces_excluded(self):
+        """Test that the earliest benchmark traces are dropped as warmup iterations."""
+        traces = [
+            [
+                _span('root', 'http post /benchmark/analyze', start, 1_000_000, trace_id=trace_id),
+                _span('chat', 'chat gpt-4o', start + 100_000, duration, parent_id='root', trace_id=trace_id),
+            ]
+            for trace_id, start, duration in (
+                ('late', 5_000_000, 300_000),
+                ('warmup', 1_000_000, 900_000),
+                ('middle', 3_000_000, 200_000),
+            )
+        ]
+        parser = self._parser(traces, warmup_iterations=1)
+
+        self.assertEqual([trace[0]['traceId'] for trace in parser.get_all_traces()], ['late', 'middle'])
+        self.assertEqual(
+            [entry['critical_io_ms'] for entry in parser.get_ai_api_critical_io()], [300.0, 200.0]
+        )
+        self.assertEqual([span.trace_id for span in parser.get_benchmark_requests()], ['late', 'middle'])
+
+
+if __name__ == '__main__':
+    unittest.main()
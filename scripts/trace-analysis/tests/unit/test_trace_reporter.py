@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for trace_reporter module.
+"""
+
+import json
+import unittest
+from trace_parser import SpanRecord
+from trace_reporter import TraceReporter
+
+
+class TestTraceReporter(unittest.TestCase):
+    """Unit tests for TraceReporter class."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.reporter = TraceReporter()
+        self.benchmark_requests = [
+            SpanRecord(
+                trace_id=f'trace-{index}',
+                span_name='http post /benchmark/analyze',
+                duration_ms=duration,
+                timestamp=index * 10_000.0,
+                span_id=f'span-{index}',
+                parent_id='ROOT',
+                tags={}
+            )
+            for index, duration in enumerate([1200.0, 980.5, 1430.25, 1010.0, 995.0], 1)
+        ]
+        self.span_analyses = {
+            'benchmark': self.benchmark_requests,
+            'empty': [],
+        }
+
+    def test_duration_stats_shared_within_report(self):
+        """Test that a span list used twice in one report is summarized once."""
+        first = self.reporter._duration_stats(self.benchmark_requests)
+
+        self.assertIs(self.reporter._duration_stats(self.benchmark_requests), first)
+        self.assertIsNot(self.reporter._duration_stats(list(self.benchmark_requests)), first)
+
+        report = self.reporter.generate_json_object([], self.benchmark_requests, self.span_analyses)
+
+        self.assertEqual(report['span_statistics']['benchmark']['basic_stats'], report['benchmark_statistics'])
+        self.assertEqual(report['span_statistics']['benchmark']['percentiles'], report['benchmark_percentiles'])
+        self.assertNotIn('empty', report['span_statistics'])
+
+    def test_duration_stats_released_after_report(self):
+        """Test that no span lists or aggregates are held once a report is returned."""
+        self.reporter.generate_json_object([], self.benchmark_requests, self.span_analyses)
+        self.assertEqual(self.reporter._stats_cache, {})
+
+        self.reporter.generate_summary_report([], self.benchmark_requests, self.span_analyses)
+        self.assertEqual(self.reporter._stats_cache, {})
+
+    def test_compact_json_escapes_like_indented(self):
+        """Test that compact output only drops whitespace, escaping non-ASCII names as before."""
+        self.span_analyses['categorization'] = [
+            SpanRecord('trace-1', 'catégorisation des e-mails', 12.5, 1.0, 'span-c', 'span-1', {})
+        ]
+
+        pretty = self.reporter.generate_json_report([], self.benchmark_requests, self.span_analyses)
+        compact = self.reporter.generate_json_report([], self.benchmark_requests, self.span_analyses, indent=False)
+
+        self.assertTrue(pretty.isascii())
+        self.assertTrue(compact.isascii())
+        self.assertLess(len(compact), len(pretty))
+
+        pretty_report, compact_report = json.loads(pretty), json.loads(compact)
+        del pretty_report['metadata']['generated_at'], compact_report['metadata']['generated_at']
+        self.assertEqual(compact_report, pretty_report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Unit tests for trace_statistics module.
+"""
+
+import random
+import statistics
+import unittest
+from array import array
+from trace_statistics import Aggregate, TraceStatistics
+
+
+class TestTraceStatistics(unittest.TestCase):
+    """Unit tests for TraceStatistics class."""
+
+    def setUp(self):
+        """Set up test data."""
+        rng = random.Random(1234)
+        self.samples = [
+            [rng.uniform(50, 5_000) for _ in range(size)]
+            for size in range(2, 41)
+        ]
+        self.durations = [120.5, 98.25, 143.0, 101.75, 99.5, 310.0, 104.25, 97.0]
+
+    def test_helpers_accept_precomputed_aggregate(self):
+        """Test that every helper gives the same result for an aggregate as for the raw values."""
+        for values in self.samples + [self.durations]:
+            agg = TraceStatistics.aggregate(values)
+
+            self.assertEqual(TraceStatistics.calculate_basic_stats(agg), TraceStatistics.calculate_basic_stats(values))
+            self.assertEqual(TraceStatistics.calculate_percentiles(agg), TraceStatistics.calculate_percentiles(values))
+            self.assertEqual(
+                TraceStatistics.calculate_coefficient_of_variation(agg),
+                TraceStatistics.calculate_coefficient_of_variation(values)
+            )
+            self.assertEqual(
+                TraceStatistics.analyze_performance_stability(agg),
+                TraceStatistics.analyze_performance_stability(values)
+            )
+
+    def test_aggregate_matches_statistics(self):
+        """Test Aggregate fields against the statistics module."""
+        agg = TraceStatistics.aggregate(self.durations)
+
+        self.assertIsInstance(agg, Aggregate)
+        self.assertIs(agg.values, self.durations)
+        self.assertEqual(list(agg.sorted_values), sorted(self.durations))
+        self.assertEqual(agg.n, len(self.durations))
+        self.assertAlmostEqual(agg.mean, statistics.mean(self.durations), places=9)
+        self.assertAlmostEqual(agg.variance, statistics.variance(self.durations), places=9)
+        self.assertAlmostEqual(agg.std_dev, statistics.stdev(self.durations), places=9)
+        self.assertEqual(agg.median, statistics.median(self.durations))
+
+    def test_aggregate_keeps_arrays_packed(self):
+        """Test that an array('d') input gives a packed sorted copy and the same moments."""
+        values = array('d', self.durations)
+
+        agg = TraceStatistics.aggregate(values)
+
+        self.assertIsInstance(agg.sorted_values, array)
+        self.assertEqual(list(agg.sorted_values), sorted(self.durations))
+        self.assertEqual(agg.mean, TraceStatistics.aggregate(self.durations).mean)
+        self.assertEqual(agg.std_dev, TraceStatistics.aggregate(self.durations).std_dev)
+
+    def test_quartiles_match_statistics_quantiles(self):
+        """Test _quartiles_from_sorted against statistics.quantiles(n=4)."""
+        for values in self.samples + [[1.0, 2.0], [3.0, 1.0, 2.0], [5.0] * 6]:
+            q1, _, q3 = statistics.quantiles(values, n=4)
+
+            result = TraceStatistics._quartiles_from_sorted(sorted(values))
+
+            self.assertAlmostEqual(result[0], q1, places=9)
+            self.assertAlmostEqual(result[1], q3, places=9)
+
+    def test_default_percentiles_match_explicit_list(self):
+        """Test that the default percentiles equal an explicit [50, 90, 95, 99] request."""
+        for values in self.samples + [[42.0]]:
+            sorted_values = sorted(values)
+
+            self.assertEqual(
+                TraceStatistics._p_default(sorted_values),
+                TraceStatistics._percentiles_from_sorted(sorted_values, [50, 90, 95, 99])
+            )
+            self.assertEqual(
+                TraceStatistics.calculate_percentiles(values),
+                TraceStatistics.calculate_percentiles(values, [50, 90, 95, 99])
+            )
+
+    def test_percentiles_keys(self):
+        """Test the percentile keys for default, explicit and empty input."""
+        self.assertEqual(list(TraceStatistics.calculate_percentiles(self.durations)), ['p50', 'p90', 'p95', 'p99'])
+        self.assertEqual(list(TraceStatistics.calculate_percentiles(self.durations, [25, 75])), ['p25', 'p75'])
+        self.assertEqual(
+            TraceStatistics.calculate_percentiles([]),
+            {'p50': 0.0, 'p90': 0.0, 'p95': 0.0, 'p99': 0.0}
+        )
+        self.assertEqual(TraceStatistics.calculate_percentiles([], [75]), {'p75': 0.0})
+
+    def test_stream_stats_matches_statistics(self):
+        """Test stream_stats on a generator against the statistics module."""
+        for values in self.samples:
+            result = TraceStatistics.stream_stats(value for value in values)
+
+            mean = statistics.mean(values)
+            std_dev = statistics.stdev(values)
+            self.assertEqual(result['count'], len(values))
+            self.assertAlmostEqual(result['mean'], mean, places=9)
+            self.assertAlmostEqual(result['variance'], statistics.variance(values), places=6)
+            self.assertAlmostEqual(result['std_dev'], std_dev, places=9)
+            self.assertEqual(result['min'], min(values))
+            self.assertEqual(result['max'], max(values))
+            self.assertEqual(result['range'], max(values) - min(values))
+            self.assertAlmostEqual(result['cv'], std_dev / mean * 100, places=9)
+
+    def test_stream_stats_matches_aggregate_helpers(self):
+        """Test that stream_stats agrees with the list-based helpers the report uses."""
+        result = TraceStatistics.stream_stats(iter(self.durations))
+        basic = TraceStatistics.calculate_basic_stats(self.durations)
+
+        self.assertAlmostEqual(result['mean'], basic['mean'], places=9)
+        self.assertAlmostEqual(result['std_dev'], basic['std_dev'], places=9)
+        self.assertAlmostEqual(
+            result['cv'], TraceStatistics.calculate_coefficient_of_variation(self.durations), places=9
+        )
+
+    def test_stream_stats_short_inputs(self):
+        """Test stream_stats with empty and single-value input."""
+        empty = TraceStatistics.stream_stats([])
+        self.assertEqual(empty['count'], 0)
+        self.assertEqual(empty['std_dev'], 0.0)
+        self.assertEqual(empty['range'], 0.0)
+        self.assertEqual(empty['cv'], 0.0)
+
+        single = TraceStatistics.stream_stats([7.5])
+        self.assertEqual(single['count'], 1)
+        self.assertEqual(single['mean'], 7.5)
+        self.assertEqual(single['std_dev'], 0.0)
+        self.assertEqual(single['range'], 0.0)
+
+    def test_stability_outliers(self):
+        """Test that analyze_performance_stability flags values outside the IQR fences."""
+        result = TraceStatistics.analyze_performance_stability(self.durations)
+
+        q1, _, q3 = statistics.quantiles(self.durations, n=4)
+        iqr = q3 - q1
+        expected = [
+            value for value in self.durations
+            if value < q1 - 1.5 * iqr or value > q3 + 1.5 * iqr
+        ]
+        self.assertEqual(result['outliers']['values'], expected)
+        self.assertEqual(result['outliers']['count'], len(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
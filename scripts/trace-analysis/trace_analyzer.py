@@ -5,6 +5,7 @@ Analyzes Zipkin trace data to extract individual request timings and generate pr
 """
 
 import argparse
+import os
 import sys
 from pathlib import Path
 
@@ -14,13 +15,14 @@ from trace_statistics import TraceStatistics
 from trace_reporter import TraceReporter
 
 
-def analyze_trace_data(trace_file: str, output_format: str = 'markdown') -> str:
+def analyze_trace_data(trace_file: str, output_format: str = 'markdown', indent: bool = True) -> str:
     """
     Analyze trace data and generate report.
     
     Args:
         trace_file: Path to the raw-zipkin-traces.json file
         output_format: Output format ('markdown' or 'json')
+        indent: Pretty-print JSON output; pass False for compact JSON
         
     Returns:
         Generated report as string
@@ -48,7 +50,7 @@ def analyze_trace_data(trace_file: str, output_format: str = 'markdown') -> str:
         
         # Generate report based on format
         if output_format.lower() == 'json':
-            return reporter.generate_json_report(http_requests, benchmark_requests, span_analyses)
+            return reporter.generate_json_report(http_requests, benchmark_requests, span_analyses, indent=indent)
         else:
             return reporter.generate_summary_report(http_requests, benchmark_requests, span_analyses)
             
@@ -63,6 +65,7 @@ def print_console_summary(trace_file: str) -> None:
     Args:
         trace_file: Path to the raw-zipkin-traces.json file
     """
+    out = []
     try:
         parser = TraceParser(trace_file)
         
@@ -71,36 +74,34 @@ def print_console_summary(trace_file: str) -> None:
         http_requests = parser.get_http_requests()
         benchmark_requests = parser.get_benchmark_requests()
         
-        print(f"=== Trace Analysis Summary ===")
-        print(f"Total traces: {len(traces)}")
-        print(f"HTTP requests: {len(http_requests)}")
-        print(f"Benchmark requests: {len(benchmark_requests)}")
-        print()
+        out.append("=== Trace Analysis Summary ===")
+        out.append(f"Total traces: {len(traces)}")
+        out.append(f"HTTP requests: {len(http_requests)}")
+        out.append(f"Benchmark requests: {len(benchmark_requests)}")
+        out.append("")
         
         # Show individual benchmark request timings
         if benchmark_requests:
-            print("=== Individual Benchmark Request Timings ===")
-            for i, req in enumerate(benchmark_requests, 1):
-                print(f"  {i}. {req['span_name']}: {req['duration_ms']:.2f}ms")
-            print()
+            out.append("=== Individual Benchmark Request Timings ===")
+            out.extend([f"  {i}. {req.span_name}: {req.duration_ms:.2f}ms"
+                        for i, req in enumerate(benchmark_requests, 1)])
+            out.append("")
             
-            # Calculate and show statistics
-            durations = [req['duration_ms'] for req in benchmark_requests]
-            if len(durations) >= 2:
-                stats = TraceStatistics.calculate_basic_stats(durations)
-                cv = TraceStatistics.calculate_coefficient_of_variation(durations)
+            # Calculate and show statistics in a single streaming pass
+            if len(benchmark_requests) >= 2:
+                stats = TraceStatistics.stream_stats(req.duration_ms for req in benchmark_requests)
                 
-                print("=== Statistics ===")
-                print(f"  Average: {stats['mean']:.2f}ms")
-                print(f"  Min: {stats['min']:.2f}ms")
-                print(f"  Max: {stats['max']:.2f}ms")
-                print(f"  Range: {stats['range']:.2f}ms")
-                print(f"  Std Dev: {stats['std_dev']:.2f}ms")
-                print(f"  CV: {cv:.1f}%")
-                print()
+                out.append("=== Statistics ===")
+                out.append(f"  Average: {stats['mean']:.2f}ms")
+                out.append(f"  Min: {stats['min']:.2f}ms")
+                out.append(f"  Max: {stats['max']:.2f}ms")
+                out.append(f"  Range: {stats['range']:.2f}ms")
+                out.append(f"  Std Dev: {stats['std_dev']:.2f}ms")
+                out.append(f"  CV: {stats['cv']:.1f}%")
+                out.append("")
         
         # Show task breakdown
-        print("=== Task Breakdown ===")
+        out.append("=== Task Breakdown ===")
         task_spans = {
             'Gmail Create Client': parser.get_spans_by_name('create_client'),
             'Gmail List Messages': parser.get_spans_by_name('list_message_ids'),
@@ -109,14 +110,17 @@ def print_console_summary(trace_file: str) -> None:
             'Security Filter Chain': parser.get_spans_by_name('security filterchain')
         }
         
-        for task_name, spans in task_spans.items():
-            if spans:
-                durations = [span['duration_ms'] for span in spans]
-                avg_duration = sum(durations) / len(durations)
-                print(f"  {task_name}: {len(spans)} occurrences, avg {avg_duration:.2f}ms")
+        out.extend([
+            f"  {task_name}: {len(spans)} occurrences, "
+            f"avg {sum(span.duration_ms for span in spans) / len(spans):.2f}ms"
+            for task_name, spans in task_spans.items() if spans
+        ])
         
     except Exception as e:
-        print(f"Error: {e}")
+        out.append(f"Error: {e}")
+    
+    # Emit everything in a single write rather than one print per line
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 def main():
@@ -132,12 +136,13 @@ def main():
     args = parser.parse_args()
     
     # Validate input file
-    trace_path = Path(args.trace_file)
-    if not trace_path.exists():
+    try:
+        os.stat(args.trace_file)
+    except (FileNotFoundError, NotADirectoryError):
         print(f"Error: Trace file not found: {args.trace_file}")
         sys.exit(1)
     
-    if not trace_path.name.endswith('raw-zipkin-traces.json'):
+    if not args.trace_file.endswith('raw-zipkin-traces.json'):
         print("Warning: Expected raw-zipkin-traces.json file")
     
     # Show console summary
@@ -145,15 +150,17 @@ def main():
     
     # Generate full report unless summary-only is specified
     if not args.summary_only:
-        report = analyze_trace_data(args.trace_file, args.format)
+        # JSON written to a file is compact; console output stays pretty-printed
+        report = analyze_trace_data(args.trace_file, args.format, indent=not args.output)
         
         if args.output:
             # Save to file
             output_path = Path(args.output)
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(report)
+            # Encode once and write through a large buffer instead of the text-mode encoder
+            with open(output_path, 'wb', buffering=1 << 20) as f:
+                f.write(report.encode('utf-8'))
             
             print(f"Report saved to: {output_path}")
         else:
@@ -5,7 +5,225 @@ Handles parsing and extraction of data from Zipkin trace files.
 """
 
 import json
-from typing import List, Dict, Any, Optional
+import sys
+from array import array
+from dataclasses import dataclass, field
+from functools import cached_property
+from itertools import accumulate
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+
+# I/O categories, derived once per distinct span name from its prefix
+IO_OTHER = 0
+IO_GMAIL = 1
+IO_CHAT = 2
+IO_KIND_BY_PATTERN = {'gmail': IO_GMAIL, 'chat': IO_CHAT}
+
+# OpenTelemetry gen_ai token usage tags
+TOTAL_TOKENS_TAG = 'gen_ai.usage.total_tokens'
+INPUT_TOKENS_TAG = 'gen_ai.usage.input_tokens'
+OUTPUT_TOKENS_TAG = 'gen_ai.usage.output_tokens'
+TOKEN_TAGS = (TOTAL_TOKENS_TAG, INPUT_TOKENS_TAG, OUTPUT_TOKENS_TAG)
+
+# Parent row sentinels for spans without a parent row in the same trace
+ROOT_ROW = -1
+ORPHAN_ROW = -2
+
+
+def _io_kind(name_lower: str) -> int:
+    """Classify a lowercased span name as a Gmail, Chat or other span."""
+    if name_lower.startswith('gmail'):
+        return IO_GMAIL
+    if name_lower.startswith('chat'):
+        return IO_CHAT
+    return IO_OTHER
+
+
+def _rows_overlap(rows: List[int], timestamps: array, durations: array) -> bool:
+    """Check if any span starts before the previous one ends, for rows sorted by start."""
+    return any(
+        timestamps[next_row] < timestamps[row] + durations[row]
+        for row, next_row in zip(rows, rows[1:])
+    )
+
+
+def _safe_int(value: Any) -> Optional[int]:
+    """Convert a tag value to int, returning None if it is not numeric."""
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _is_benchmark_name(name_lower: str) -> bool:
+    """Check if a lowercased span name is the benchmark HTTP request."""
+    return 'http' in name_lower and 'benchmark/analyze' in name_lower
+
+
+@dataclass(slots=True, frozen=True)
+class SpanRecord:
+    """Standardized, read-only view of a single span."""
+    trace_id: str
+    span_name: str
+    duration_ms: float
+    timestamp: float
+    span_id: str
+    parent_id: str
+    tags: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dictionary for serialization."""
+        return {
+            'trace_id': self.trace_id,
+            'span_name': self.span_name,
+            'duration_ms': self.duration_ms,
+            'timestamp': self.timestamp,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'tags': self.tags
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class SpanName:
+    """Lowercased form and categories of a distinct span name."""
+    lower: str
+    io_kind: int
+    is_benchmark: bool
+
+    @classmethod
+    def from_name(cls, name: str) -> 'SpanName':
+        """Lowercase and classify a span name."""
+        lower = name.lower()
+        return cls(lower=lower, io_kind=_io_kind(lower), is_benchmark=_is_benchmark_name(lower))
+
+
+@dataclass
+class TraceHierarchy:
+    """Parent/child structure of a trace's rows, with siblings in start order."""
+    children: List[List[int]]
+    roots: List[int]
+    orphans: List[int]
+    children_overlap: List[bool]
+    roots_overlap: bool
+
+    @classmethod
+    def from_trace(cls, trace: List[Dict[str, Any]], timestamps: array, durations: array) -> 'TraceHierarchy':
+        """Link each span to its parent row and order siblings by start."""
+        # Span ids resolve to their last occurrence, ordered by first occurrence
+        row_by_id = {span['id']: row for row, span in enumerate(trace)}
+        parent_rows = array('i', [
+            ROOT_ROW if parent_id is None else row_by_id.get(parent_id, ORPHAN_ROW)
+            for parent_id in (span.get('parentId') for span in trace)
+        ])
+
+        children: List[List[int]] = [[] for _ in trace]
+        roots = []
+        orphans = []
+        for row in row_by_id.values():
+            parent_row = parent_rows[row]
+            if parent_row == ROOT_ROW:
+                roots.append(row)
+            elif parent_row == ORPHAN_ROW:
+                orphans.append(row)
+            else:
+                children[parent_row].append(row)
+
+        # Siblings that never overlap stay sequential for any subset of them
+        start_of = timestamps.__getitem__
+        for child_rows in children:
+            child_rows.sort(key=start_of)
+        roots.sort(key=start_of)
+
+        return cls(
+            children=children,
+            roots=roots,
+            orphans=orphans,
+            children_overlap=[_rows_overlap(child_rows, timestamps, durations) for child_rows in children],
+            roots_overlap=_rows_overlap(roots, timestamps, durations)
+        )
+
+
+@dataclass
+class TraceColumns:
+    """Column-oriented view of a single trace, one row per span in trace order.
+
+    Timestamps and durations are kept in microseconds; Zipkin emits them as integers,
+    which float64 holds exactly, so interval arithmetic on epoch timestamps is lossless.
+    """
+    spans: List[Dict[str, Any]] = field(repr=False)
+    span_names: Dict[str, SpanName] = field(repr=False)
+    timestamps: array
+    durations: array
+    io_kinds: array
+    is_benchmark: bool
+    total_tokens: int
+    input_tokens: int
+    output_tokens: int
+    token_spans: int
+    critical_io_cache: Dict[Tuple[str, ...], float] = field(default_factory=dict)
+
+    @classmethod
+    def from_trace(cls, trace: List[Dict[str, Any]], span_names: Dict[str, SpanName]) -> 'TraceColumns':
+        """Extract the span columns of a trace, looking up each name in the shared table."""
+        infos = [span_names[span.get('name', '')] for span in trace]
+        timestamps = array('d', [span.get('timestamp', 0) for span in trace])
+        durations = array('d', [span.get('duration', 0) for span in trace])
+        is_benchmark = any(info.is_benchmark for info in infos)
+
+        io_kinds = array('b', [info.io_kind for info in infos])
+
+        # Token usage is only reported on chat spans; a malformed count ends
+        # that span's contribution, leaving the counts before it in place
+        token_counts = [0, 0, 0]
+        token_spans = 0
+        for span, kind in zip(trace, io_kinds):
+            if kind != IO_CHAT:
+                continue
+            tags = span.get('tags')
+            if not tags:
+                continue
+            for index, tag in enumerate(TOKEN_TAGS):
+                value = tags.get(tag)
+                if value is None:
+                    continue
+                if tag == TOTAL_TOKENS_TAG:
+                    token_spans += 1
+                count = _safe_int(value)
+                if count is None:
+                    break
+                token_counts[index] += count
+        total_tokens, input_tokens, output_tokens = token_counts
+
+        return cls(
+            spans=trace,
+            span_names=span_names,
+            timestamps=timestamps,
+            durations=durations,
+            io_kinds=io_kinds,
+            is_benchmark=is_benchmark,
+            total_tokens=total_tokens,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            token_spans=token_spans
+        )
+
+    @cached_property
+    def hierarchy(self) -> TraceHierarchy:
+        """Span hierarchy, built on first use by the recursive aggregation."""
+        return TraceHierarchy.from_trace(self.spans, self.timestamps, self.durations)
+
+    def critical_mask(self, patterns: Sequence[str]) -> List[bool]:
+        """Flag the rows whose name starts with any of the given lowercase patterns."""
+        kinds = {IO_KIND_BY_PATTERN.get(pattern) for pattern in patterns}
+        if None not in kinds:
+            return [kind in kinds for kind in self.io_kinds]
+        prefixes = tuple(patterns)
+        span_names = self.span_names
+        return [span_names[span.get('name', '')].lower.startswith(prefixes) for span in self.spans]
 
 
 class TraceParser:
@@ -16,30 +234,54 @@ class TraceParser:
         self.trace_file_path = trace_file_path
         self.warmup_iterations = warmup_iterations
         self.traces = []
+        # Interned span name -> its lowercased form and categories
+        self._span_names: Dict[str, SpanName] = {'': SpanName.from_name('')}
+        self._spans_by_name_cache: Dict[str, List[SpanRecord]] = {}
         self._load_traces()
         self._exclude_warmup_iterations()
 
     def _load_traces_direct(self) -> List[List[Dict[str, Any]]]:
         """Load traces from JSON file without warmup exclusion."""
         try:
-            with open(self.trace_file_path, 'r', encoding='utf-8-sig') as f:
-                wrapper_data = json.load(f)
-            return json.loads(wrapper_data.get('rawData', '[]'))
+            with open(self.trace_file_path, 'rb') as f:
+                data = f.read()
+            if data.startswith(b'\xef\xbb\xbf'):
+                data = data[3:]
+            raw_data = json.loads(data).get('rawData', '[]')
+            del data
+            return json.loads(raw_data)
         except (FileNotFoundError, json.JSONDecodeError, Exception) as e:
             raise ValueError(f"Failed to load traces from {self.trace_file_path}: {e}")
 
     def _load_traces(self) -> None:
         """Load traces from the JSON file."""
         self.traces = self._load_traces_direct()
+        self._index_spans()
+
+    def _index_spans(self) -> None:
+        """Walk all spans once after loading, intern repeated strings and classify each distinct name."""
+        intern = sys.intern
+        span_names = self._span_names
+        for trace in self.traces:
+            for span in trace:
+                name = span.get('name')
+                if isinstance(name, str):
+                    name = span['name'] = intern(name)
+                    if name not in span_names:
+                        span_names[name] = SpanName.from_name(name)
+                endpoint = span.get('localEndpoint')
+                if endpoint and isinstance(endpoint.get('serviceName'), str):
+                    endpoint['serviceName'] = intern(endpoint['serviceName'])
+
+    @cached_property
+    def _columns(self) -> List[TraceColumns]:
+        """Column views aligned with self.traces, built on first query after warmup exclusion."""
+        return [TraceColumns.from_trace(trace, self._span_names) for trace in self.traces]
 
     def _is_benchmark_trace(self, trace: List[Dict[str, Any]]) -> bool:
         """Check if trace contains benchmark HTTP request."""
-        return any(
-            'name' in span and
-            'http' in span['name'].lower() and
-            'benchmark/analyze' in span['name'].lower()
-            for span in trace
-        )
+        span_names = self._span_names
+        return any(span_names[span.get('name', '')].is_benchmark for span in trace)
 
     def _exclude_warmup_iterations(self) -> None:
         """Exclude warmup iterations from traces based on warmup_iterations parameter."""
@@ -49,138 +291,128 @@ class TraceParser:
             return
 
         # Find benchmark traces
-        benchmark_traces = [trace for trace in self.traces if self._is_benchmark_trace(trace)]
+        benchmark_indices = [index for index, trace in enumerate(self.traces) if self._is_benchmark_trace(trace)]
 
-        if len(benchmark_traces) <= warmup_iterations:
-            print(f"Warning: Only {len(benchmark_traces)} iterations found, but {warmup_iterations} warmup iterations to exclude")
+        if len(benchmark_indices) <= warmup_iterations:
+            print(f"Warning: Only {len(benchmark_indices)} iterations found, but {warmup_iterations} warmup iterations to exclude")
             return
 
         # Sort by timestamp and exclude first N traces
-        benchmark_traces.sort(key=lambda trace: min(span.get('timestamp', float('inf')) for span in trace))
-        warmup_trace_ids = {
-            trace[0].get('traceId', '')
-            for trace in benchmark_traces[:warmup_iterations]
-        }
+        benchmark_indices.sort(key=lambda index: min(span.get('timestamp', float('inf')) for span in self.traces[index]))
+        warmup_indices = set(benchmark_indices[:warmup_iterations])
 
         # Filter out warmup traces
         original_count = len(self.traces)
-        self.traces = [
-            trace for trace in self.traces
-            if not (trace and trace[0].get('traceId', '') in warmup_trace_ids)
-        ]
+        self.traces = [trace for index, trace in enumerate(self.traces) if index not in warmup_indices]
 
         excluded_count = original_count - len(self.traces)
         print(f"Excluded {excluded_count} warmup traces ({warmup_iterations} iterations)")
 
-    def _create_span_dict(self, span: Dict[str, Any]) -> Dict[str, Any]:
-        """Create standardized span dictionary with common fields."""
-        return {
-            'trace_id': span['traceId'],
-            'span_name': span['name'],
-            'duration_ms': span['duration'] / 1000,
-            'timestamp': span.get('timestamp', 0) / 1000,
-            'span_id': span.get('id', ''),
-            'parent_id': span.get('parentId', 'ROOT'),
-            'tags': span.get('tags', {})
-        }
+    def _create_span_record(self, span: Dict[str, Any]) -> SpanRecord:
+        """Create standardized span record with common fields."""
+        return SpanRecord(
+            trace_id=span['traceId'],
+            span_name=span['name'],
+            duration_ms=span['duration'] / 1000,
+            timestamp=span.get('timestamp', 0) / 1000,
+            span_id=span.get('id', ''),
+            parent_id=span.get('parentId', 'ROOT'),
+            tags=span.get('tags', {})
+        )
 
-    def _filter_spans_by_pattern(self, pattern: str, startswith: bool = True) -> List[Dict[str, Any]]:
+    def _filter_spans_by_pattern(self, pattern: str, startswith: bool = True) -> List[SpanRecord]:
         """Filter spans by name pattern across all traces."""
         matching_spans = []
 
-        for trace in self.traces:
-            for span in trace:
-                if ('name' in span and 'duration' in span):
-                    name_lower = span['name'].lower()
-                    pattern_lower = pattern.lower()
-
-                    if (startswith and name_lower.startswith(pattern_lower)) or \
-                       (not startswith and pattern_lower in name_lower):
-                        matching_spans.append(self._create_span_dict(span))
+        for trace, columns in zip(self.traces, self._columns):
+            matching_spans.extend(self._filter_spans_in_trace(trace, columns, pattern, startswith))
 
         return matching_spans
 
-    def get_spans_by_name(self, span_name: str) -> List[Dict[str, Any]]:
-        """Get all spans matching a specific name pattern."""
-        return self._filter_spans_by_pattern(span_name, startswith=False)
+    def _filter_spans_in_trace(self, trace: List[Dict[str, Any]], columns: TraceColumns,
+                               pattern: str, startswith: bool = True) -> List[SpanRecord]:
+        """Filter spans of a single trace by name pattern."""
+        pattern_lower = pattern.lower()
+
+        if startswith:
+            # Reuses the load-time span categories for 'gmail' and 'chat'
+            matches = columns.critical_mask((pattern_lower,))
+        else:
+            span_names = columns.span_names
+            matches = [pattern_lower in span_names[span.get('name', '')].lower for span in trace]
+
+        return [
+            self._create_span_record(span)
+            for span, is_match in zip(trace, matches)
+            if is_match and 'name' in span and 'duration' in span
+        ]
+
+    def get_spans_by_name(self, span_name: str) -> List[SpanRecord]:
+        """Get all spans matching a specific name pattern.
 
-    def get_benchmark_requests(self) -> List[Dict[str, Any]]:
+        Results are memoized per name; the returned list is shared and must not be mutated.
+        """
+        spans = self._spans_by_name_cache.get(span_name)
+        if spans is None:
+            spans = self._filter_spans_by_pattern(span_name, startswith=False)
+            self._spans_by_name_cache[span_name] = spans
+        return spans
+
+    def get_benchmark_requests(self) -> List[SpanRecord]:
         """Extract only benchmark analyze endpoint requests."""
         return self._filter_spans_by_pattern('benchmark/analyze', startswith=False)
 
-    def _get_critical_spans(self, patterns: List[str]) -> List[Dict[str, Any]]:
+    def _get_critical_spans(self, patterns: List[str]) -> List[SpanRecord]:
         """Get critical spans by multiple patterns."""
         critical_spans = []
 
-        for trace in self.traces:
-            for span in trace:
-                if ('name' in span and 'duration' in span):
-                    name_lower = span['name'].lower()
-                    if any(name_lower.startswith(pattern) for pattern in patterns):
-                        critical_spans.append(self._create_span_dict(span))
+        for trace, columns in zip(self.traces, self._columns):
+            for span, is_critical in zip(trace, columns.critical_mask(patterns)):
+                if is_critical and 'name' in span and 'duration' in span:
+                    critical_spans.append(self._create_span_record(span))
 
         return critical_spans
 
-    def _aggregate_critical_spans(self, critical_spans: List[Dict[str, Any]],
-                                 trace: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Perform hierarchical aggregation of critical spans."""
+    def _aggregate_critical_spans(self, critical_spans: List[SpanRecord],
+                                 trace: List[Dict[str, Any]], columns: TraceColumns) -> List[Dict[str, Any]]:
+        """Perform hierarchical aggregation of critical spans in a single bottom-up pass."""
         if not critical_spans:
             return []
 
-        span_lookup = {span['id']: span for span in trace}
-        current_level_spans = []
-
-        # Initialize with spans that have critical children or are critical themselves
-        for span in trace:
-            span_id = span.get('id', '')
-            children_duration = self._get_children_critical_duration(span_id, critical_spans, span_lookup)
-            span_duration = self._get_span_duration(span_id, critical_spans)
-
-            if span_id in [s['span_id'] for s in critical_spans] or children_duration > 0:
-                current_level_spans.append({
-                    'span_id': span_id,
-                    'parent_id': span.get('parentId', 'ROOT'),
-                    'name': span['name'],
-                    'duration_ms': span_duration if span_duration > 0 else children_duration,
-                    'timestamp': span.get('timestamp', 0) / 1000,
-                    'trace_id': span['traceId']
-                })
-
-        # Hierarchical aggregation
-        for _ in range(10):  # Max iterations
-            parent_groups = {}
-            root_level_spans = []
-
-            for span in current_level_spans:
-                parent_id = span['parent_id']
-                if parent_id == 'ROOT' or parent_id not in span_lookup:
-                    root_level_spans.append(span)
-                else:
-                    parent_groups.setdefault(parent_id, []).append(span)
-
-            if not parent_groups:
-                break
-
-            aggregated_spans = []
-            for parent_id, group_spans in parent_groups.items():
-                if len(group_spans) == 1:
-                    aggregated_spans.extend(group_spans)
+        # Index critical durations once; the first occurrence of a span id wins
+        critical_duration_by_id = {}
+        for critical_span in critical_spans:
+            critical_duration_by_id.setdefault(critical_span.span_id, critical_span.duration_ms)
+
+        # Top-down order from the root-level spans; walking it backwards visits children before parents
+        hierarchy = columns.hierarchy
+        top_rows = hierarchy.roots + hierarchy.orphans
+        order = []
+        stack = list(top_rows)
+        while stack:
+            row = stack.pop()
+            order.append(row)
+            stack.extend(hierarchy.children[row])
+
+        level_spans: Dict[int, Dict[str, Any]] = {}
+        for row in reversed(order):
+            span = trace[row]
+            span_id = span['id']
+            span_duration = critical_duration_by_id.get(span_id, 0)
+            child_spans = [level_spans[child] for child in hierarchy.children[row] if child in level_spans]
+
+            if span_duration > 0 or (not child_spans and span_id in critical_duration_by_id):
+                # Critical spans cover whatever critical I/O runs beneath them
+                level_spans[row] = self._create_level_span(span, span_duration)
+            elif len(child_spans) == 1:
+                level_spans[row] = child_spans[0]
+            elif child_spans:
+                if self._check_concurrency(child_spans):
+                    level_spans[row] = max(child_spans, key=lambda x: x['duration_ms'])
                 else:
-                    if self._check_concurrency(group_spans):
-                        aggregated_spans.append(max(group_spans, key=lambda x: x['duration_ms']))
-                    else:
-                        aggregated_span = self._create_aggregated_span(
-                            parent_id, group_spans, critical_spans, span_lookup)
-                        if aggregated_span:
-                            aggregated_spans.append(aggregated_span)
-
-            aggregated_spans.extend(root_level_spans)
-            if len(aggregated_spans) >= len(current_level_spans):
-                break
+                    level_spans[row] = self._create_aggregated_span(span, child_spans)
 
-            current_level_spans = aggregated_spans
-
-        return current_level_spans
+        return [level_spans[row] for row in top_rows if row in level_spans]
 
     def _check_concurrency(self, spans: List[Dict[str, Any]]) -> bool:
         """Check if spans are concurrent using timestamps."""
@@ -197,37 +429,26 @@ class TraceParser:
 
         return False
 
-    def _get_span_duration(self, span_id: str, critical_spans: List[Dict[str, Any]]) -> float:
-        """Get duration for a span if it's in critical spans, otherwise 0."""
-        for critical_span in critical_spans:
-            if critical_span['span_id'] == span_id:
-                return critical_span['duration_ms']
-        return 0
-
-    def _get_children_critical_duration(self, parent_id: str, critical_spans: List[Dict[str, Any]],
-                                     span_lookup: Dict[str, Any]) -> float:
-        """Get total duration of critical spans under a parent."""
-        return sum(
-            self._get_span_duration(span_id, critical_spans)
-            for span_id, span in span_lookup.items()
-            if span.get('parentId') == parent_id and
-               span_id in [s['span_id'] for s in critical_spans]
-        )
+    def _create_level_span(self, span: Dict[str, Any], duration_ms: float) -> Dict[str, Any]:
+        """Create the aggregation entry for a critical span."""
+        return {
+            'span_id': span['id'],
+            'name': span['name'],
+            'duration_ms': duration_ms,
+            'timestamp': span.get('timestamp', 0) / 1000,
+            'trace_id': span['traceId']
+        }
 
-    def _create_aggregated_span(self, parent_id: str, children_spans: List[Dict[str, Any]],
-                              critical_spans: List[Dict[str, Any]],
-                              span_lookup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Create an aggregated span representing critical children."""
+    def _create_aggregated_span(self, parent_span: Dict[str, Any],
+                              children_spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create an aggregated span representing sequential critical children."""
         total_duration = sum(span['duration_ms'] for span in children_spans)
         min_timestamp = min(span['timestamp'] for span in children_spans)
-
-        parent_span = span_lookup.get(parent_id)
-        base_name = parent_span.get('name', parent_id) if parent_span else parent_id
+        parent_id = parent_span['id']
 
         return {
             'span_id': f"aggregated_critical_{parent_id}",
-            'parent_id': parent_span.get('parentId', 'ROOT') if parent_span else 'ROOT',
-            'name': f"aggregated_critical_{base_name}",
+            'name': f"aggregated_critical_{parent_span.get('name', parent_id)}",
             'duration_ms': total_duration,
             'timestamp': min_timestamp,
             'trace_id': children_spans[0]['trace_id']
@@ -238,18 +459,17 @@ class TraceParser:
         if len(final_spans) == 1:
             return final_spans[0]['duration_ms']
 
-        if self._check_concurrency(final_spans):
-            return max(span['duration_ms'] for span in final_spans)
-        else:
-            return sum(span['duration_ms'] for span in final_spans)
+        return self._combine_siblings([
+            (span['timestamp'], span['duration_ms'], span['duration_ms']) for span in final_spans
+        ])
 
     def _calculate_critical_io_for_pattern(self, pattern: str) -> List[Dict[str, Any]]:
         """Calculate critical I/O for a specific pattern (e.g., 'gmail', 'chat')."""
         critical_io_values = []
 
-        for trace in self.traces:
-            # Find spans matching pattern
-            pattern_spans = self._filter_spans_by_pattern(pattern, startswith=True)
+        for trace, columns in zip(self.traces, self._columns):
+            # Find spans matching pattern within this trace only
+            pattern_spans = self._filter_spans_in_trace(trace, columns, pattern, startswith=True)
 
             if not pattern_spans:
                 critical_io_values.append({
@@ -260,7 +480,7 @@ class TraceParser:
                 })
                 continue
 
-            final_spans = self._aggregate_critical_spans(pattern_spans, trace)
+            final_spans = self._aggregate_critical_spans(pattern_spans, trace, columns)
             critical_io = self._calculate_final_critical_io(final_spans)
 
             critical_io_values.append({
@@ -293,7 +513,7 @@ class TraceParser:
         if isinstance(patterns, str):
             patterns = [patterns]
         
-        for trace in self.traces:
+        for trace, columns in zip(self.traces, self._columns):
             if not trace:
                 critical_io_values.append({
                     'trace_id': '',
@@ -304,12 +524,9 @@ class TraceParser:
                 continue
 
             # Identify all I/O spans
-            io_spans = [
-                span for span in trace 
-                if any(span.get('name', '').lower().startswith(pattern) for pattern in patterns)
-            ]
+            io_rows = [row for row, is_io in enumerate(columns.critical_mask(patterns)) if is_io]
             
-            if not io_spans:
+            if not io_rows:
                 critical_io_values.append({
                     'trace_id': trace[0].get('traceId', ''),
                     'critical_io_ms': 0,
@@ -318,73 +535,42 @@ class TraceParser:
                 })
                 continue
 
-            # Convert spans to intervals
-            intervals = []
-            for span in io_spans:
-                start_time = span.get('timestamp', 0) / 1000  # Convert to ms
-                duration = span.get('duration', 0) / 1000  # Convert to ms
-                end_time = start_time + duration
-                
-                intervals.append({
-                    'start': start_time,
-                    'end': end_time,
-                    'duration': duration,
-                    'span_id': span['id'],
-                    'span_name': span.get('name', 'N/A')
-                })
-            
-            # Sort intervals by start time
-            intervals.sort(key=lambda x: x['start'])
+            # Interval start/end columns in microseconds, so subtracting epoch timestamps stays exact
+            timestamps, durations = columns.timestamps, columns.durations
+            starts = [timestamps[row] for row in io_rows]
+            ends = [start + durations[row] for start, row in zip(starts, io_rows)]
             
-            # Merge overlapping intervals
-            merged_intervals = self._merge_intervals(intervals)
-            
-            # Sum durations of merged intervals (total elapsed time where at least one I/O was active)
-            total_critical_io = sum(interval['duration'] for interval in merged_intervals)
+            # Total elapsed time where at least one I/O was active
+            total_critical_io = self._union_duration(starts, ends) / 1000  # Convert to ms
 
             critical_io_values.append({
                 'trace_id': trace[0].get('traceId', ''),
                 'critical_io_ms': total_critical_io,
-                'spans_count': len(io_spans),
+                'spans_count': len(io_rows),
                 'execution_pattern': 'union_intervals'
             })
 
         return critical_io_values
 
-    def _merge_intervals(self, intervals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Merge overlapping intervals into unique continuous blocks."""
-        if not intervals:
-            return []
-        
-        merged = []
-        current_interval = intervals[0].copy()
-        
-        for i in range(1, len(intervals)):
-            next_interval = intervals[i]
-            
-            if next_interval['start'] <= current_interval['end']:
-                # Overlapping - merge them
-                current_interval['end'] = max(current_interval['end'], next_interval['end'])
-                current_interval['duration'] = current_interval['end'] - current_interval['start']
-                # Keep span info for debugging
-                if 'merged_spans' not in current_interval:
-                    current_interval['merged_spans'] = [current_interval['span_id']]
-                current_interval['merged_spans'].append(next_interval['span_id'])
-            else:
-                # No overlap - add current and start new
-                merged.append(current_interval)
-                current_interval = next_interval.copy()
-        
-        # Add the last interval
-        merged.append(current_interval)
-        
-        return merged
+    def _union_duration(self, starts: List[float], ends: List[float]) -> float:
+        """Total length covered by the union of intervals given as start/end columns."""
+        if not starts:
+            return 0
+
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        sorted_starts = [starts[i] for i in order]
+
+        # Running max of end times; a new merged block starts wherever the next start lies beyond it
+        reach = list(accumulate((ends[i] for i in order), max))
+        gaps = sum(start - end for start, end in zip(sorted_starts[1:], reach) if start > end)
+
+        return reach[-1] - sorted_starts[0] - gaps
 
     def _get_unified_critical_io(self) -> List[Dict[str, Any]]:
         """Calculate critical I/O treating all Gmail and Chat spans as unified I/O operations."""
         critical_io_values = []
 
-        for trace in self.traces:
+        for trace, columns in zip(self.traces, self._columns):
             if not trace:
                 critical_io_values.append({
                     'trace_id': '',
@@ -395,12 +581,9 @@ class TraceParser:
                 continue
 
             # Count ALL I/O spans (Gmail + Chat)
-            io_spans = [
-                span for span in trace 
-                if span.get('name', '').lower().startswith(('gmail', 'chat'))
-            ]
+            io_spans_count = sum(kind != IO_OTHER for kind in columns.io_kinds)
             
-            if not io_spans:
+            if not io_spans_count:
                 critical_io_values.append({
                     'trace_id': trace[0].get('traceId', ''),
                     'critical_io_ms': 0,
@@ -410,124 +593,95 @@ class TraceParser:
                 continue
 
             # Use unified recursive algorithm that treats all I/O spans equally
-            critical_io = self._calculate_unified_critical_io_recursive(trace)
+            critical_io = self._calculate_unified_critical_io_recursive(columns)
 
             critical_io_values.append({
                 'trace_id': trace[0].get('traceId', ''),
                 'critical_io_ms': critical_io,
-                'spans_count': len(io_spans),
+                'spans_count': io_spans_count,
                 'execution_pattern': 'unified_recursive_hierarchical'
             })
 
         return critical_io_values
 
-    def _calculate_unified_critical_io_recursive(self, trace: List[Dict[str, Any]]) -> float:
+    def _calculate_unified_critical_io_recursive(self, columns: TraceColumns) -> float:
         """Calculate critical I/O using recursive hierarchical aggregation treating all I/O spans equally."""
-        # Build span hierarchy with ALL spans
-        span_lookup = {span['id']: span for span in trace}
-        root_spans = [span for span in trace if span.get('parentId') is None]
-        
-        if not root_spans:
+        # Gmail and Chat spans are exactly the ('gmail', 'chat') pattern set, so share its cached result
+        return self._calculate_final_critical_io_recursive(columns, ['gmail', 'chat'])
+
+    def _combine_siblings(self, siblings: List[Tuple[float, float, float]]) -> float:
+        """Combine sibling values in one sweep: max if their intervals overlap, otherwise sum.
+
+        Each sibling is a (start, duration, value) tuple.
+        """
+        if not siblings:
             return 0
-        
-        # Recursive aggregation for each root span
-        root_values = []
-        for root_span in root_spans:
-            value = self._aggregate_unified_span_recursive(root_span, span_lookup)
-            root_values.append(value)
-        
-        # Final aggregation at root level
-        if len(root_values) == 1:
-            return root_values[0]
-        
-        # Check if root spans are concurrent
-        root_span_dicts = []
-        for root_span in root_spans:
-            root_span_dicts.append({
-                'timestamp': root_span.get('timestamp', 0) / 1000,
-                'duration_ms': root_span.get('duration', 0) / 1000
-            })
-        
-        if self._check_concurrency(root_span_dicts):
-            return max(root_values)
-        else:
-            return sum(root_values)
 
-    def _aggregate_unified_span_recursive(self, span: Dict[str, Any], 
-                                         span_lookup: Dict[str, Dict[str, Any]]) -> float:
-        """Recursively aggregate span value treating all I/O spans (gmail/chat) equally."""
-        span_id = span['id']
-        span_name = span.get('name', '').lower()
-        
-        # Find ALL children (not just critical ones) - SAME AS YOUR ORIGINAL
-        children = [s for s in span_lookup.values() if s.get('parentId') == span_id]
-        
-        # Recursively get values from ALL children - SAME AS YOUR ORIGINAL
-        child_values = []
-        for child in children:
-            child_value = self._aggregate_unified_span_recursive(child, span_lookup)
-            child_values.append(child_value)
-        
-        # Determine this span's value - UNIFIED I/O approach
-        if span_name.startswith('gmail') or span_name.startswith('chat'):
-            # This is an I/O span - use its duration
-            span_value = span.get('duration', 0) / 1000  # Convert to ms
-        else:
-            # This is not an I/O span - value comes from children only
-            span_value = 0
-        
-        # Aggregate children values with this span's value - SAME AS YOUR ORIGINAL
-        all_values = [span_value] + child_values
-        
-        if len(all_values) == 1:
-            return all_values[0]
-        
-        # Check concurrency among children with I/O values only - SAME LOGIC AS YOUR ORIGINAL
-        io_children = []
-        for i, child in enumerate(children):
-            if child_values[i] > 0:  # Only consider children that contribute to I/O
-                io_children.append(child)
-        
-        if len(io_children) <= 1:
-            # No I/O children or single I/O child - just add to span value
-            return sum(all_values)
-        
-        # Create child span dictionaries for concurrency check using only I/O children
-        child_span_dicts = []
-        for child in io_children:
-            child_span_dicts.append({
-                'timestamp': child.get('timestamp', 0) / 1000,
-                'duration_ms': child.get('duration', 0) / 1000
-            })
-        
-        # Check concurrency among I/O children only - SAME AS YOUR ORIGINAL
-        if self._check_concurrency(child_span_dicts):
-            # I/O children are concurrent - take max of I/O children values, then add span value
-            io_values = [child_values[i] for i, child in enumerate(children) if child_values[i] > 0]
-            children_aggregated = max(io_values) if io_values else 0
-        else:
-            # I/O children are sequential - sum I/O children values, then add span value
-            io_values = [child_values[i] for i, child in enumerate(children) if child_values[i] > 0]
-            children_aggregated = sum(io_values)
-        
-        return span_value + children_aggregated
+        concurrent = False
+        previous_end = None
+        total = 0
+        largest = siblings[0][2]
+
+        for start, duration, value in sorted(siblings, key=itemgetter(0)):
+            if previous_end is not None and start < previous_end:
+                concurrent = True
+            previous_end = start + duration
+            total += value
+            if value > largest:
+                largest = value
+
+        return largest if concurrent else total
+
+    def _aggregate_span_tree(self, root: int, columns: TraceColumns, critical: List[bool]) -> float:
+        """Aggregate critical I/O (in microseconds) bottom-up over a span subtree using an explicit post-order stack."""
+        timestamps, durations = columns.timestamps, columns.durations
+        hierarchy = columns.hierarchy
+        children_of = hierarchy.children
+        values: Dict[int, float] = {}
+        entered = {root}
+        stack = [(root, False)]
+
+        while stack:
+            row, expanded = stack.pop()
+            children = children_of[row]
+
+            if not expanded:
+                # Revisit this span once all of its children have values
+                stack.append((row, True))
+                for child in children:
+                    if child not in entered:
+                        entered.add(child)
+                        stack.append((child, False))
+                continue
 
-    def _collect_io_spans_in_subtree(self, span: Dict[str, Any], 
-                                    span_lookup: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Collect all I/O spans (gmail/chat) in the subtree under this span."""
-        io_spans = []
-        span_name = span.get('name', '').lower()
-        
-        # Check if this span is an I/O span
-        if span_name.startswith('gmail') or span_name.startswith('chat'):
-            io_spans.append(span)
-        
-        # Recursively check children
-        children = [s for s in span_lookup.values() if s.get('parentId') == span['id']]
-        for child in children:
-            io_spans.extend(self._collect_io_spans_in_subtree(child, span_lookup))
-        
-        return io_spans
+            # Determine this span's value - critical spans contribute their own duration
+            span_value = durations[row] if critical[row] else 0
+
+            child_values = [values.get(child, 0) for child in children]
+
+            if not child_values:
+                values[row] = span_value
+                continue
+
+            # Check concurrency among children - only consider children that have critical values
+            critical_children = [child for child, value in zip(children, child_values) if value > 0]
+
+            if len(critical_children) <= 1:
+                # No critical children or single critical child - just add to span value
+                values[row] = sum([span_value] + child_values)
+                continue
+
+            # Concurrent critical children contribute their max, sequential ones their sum
+            if hierarchy.children_overlap[row]:
+                children_aggregated = self._combine_siblings([
+                    (timestamps[child], durations[child], values[child]) for child in critical_children
+                ])
+            else:
+                children_aggregated = sum(values[child] for child in critical_children)
+
+            values[row] = span_value + children_aggregated
+
+        return values[root]
 
     def _get_critical_io_by_pattern(self, patterns) -> List[Dict[str, Any]]:
         """Generic method to calculate critical I/O for given patterns using recursive hierarchical aggregation."""
@@ -540,7 +694,7 @@ class TraceParser:
         else:
             pattern_name = 'total'
 
-        for trace in self.traces:
+        for trace, columns in zip(self.traces, self._columns):
             if not trace:
                 critical_io_values.append({
                     'trace_id': '',
@@ -551,12 +705,9 @@ class TraceParser:
                 continue
 
             # Count critical spans matching patterns
-            critical_spans = [
-                span for span in trace 
-                if any(span.get('name', '').lower().startswith(pattern) for pattern in patterns)
-            ]
+            critical_spans_count = sum(columns.critical_mask(patterns))
             
-            if not critical_spans:
+            if not critical_spans_count:
                 pattern_key = f'no_{pattern_name}_spans' if len(patterns) == 1 else 'no_critical_spans'
                 critical_io_values.append({
                     'trace_id': trace[0].get('traceId', ''),
@@ -567,164 +718,70 @@ class TraceParser:
                 continue
 
             # Use recursive algorithm
-            critical_io = self._calculate_final_critical_io_recursive(trace, patterns)
+            critical_io = self._calculate_final_critical_io_recursive(columns, patterns)
 
             critical_io_values.append({
                 'trace_id': trace[0].get('traceId', ''),
                 'critical_io_ms': critical_io,
-                'spans_count': len(critical_spans),
+                'spans_count': critical_spans_count,
                 'execution_pattern': 'recursive_hierarchical'
             })
 
         return critical_io_values
 
-    def _calculate_final_critical_io_recursive(self, trace: List[Dict[str, Any]], 
+    def _calculate_final_critical_io_recursive(self, columns: TraceColumns, 
                                            critical_patterns: List[str]) -> float:
         """Calculate critical I/O using recursive hierarchical aggregation on complete span tree."""
-        # Build span hierarchy with ALL spans (not just critical ones)
-        span_lookup = {span['id']: span for span in trace}
-        root_spans = [span for span in trace if span.get('parentId') is None]
+        cache_key = tuple(critical_patterns)
+        cached = columns.critical_io_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        critical_io = self._aggregate_root_spans(columns, critical_patterns)
+        columns.critical_io_cache[cache_key] = critical_io
+        return critical_io
+
+    def _aggregate_root_spans(self, columns: TraceColumns, critical_patterns: List[str]) -> float:
+        """Aggregate critical I/O across all root spans of a trace."""
+        hierarchy = columns.hierarchy
+        root_rows = hierarchy.roots
         
-        if not root_spans:
+        if not root_rows:
             return 0
         
-        # Recursive aggregation for each root span
-        root_values = []
-        for root_span in root_spans:
-            value = self._aggregate_span_recursive(root_span, span_lookup, critical_patterns)
-            root_values.append(value)
+        # Aggregate each root span over the complete hierarchy (not just critical spans)
+        critical = columns.critical_mask(critical_patterns)
+        root_values = [self._aggregate_span_tree(root, columns, critical) for root in root_rows]
         
         # Final aggregation at root level
         if len(root_values) == 1:
-            return root_values[0]
-        
-        # Check if root spans are concurrent
-        root_span_dicts = []
-        for root_span in root_spans:
-            root_span_dicts.append({
-                'timestamp': root_span.get('timestamp', 0) / 1000,
-                'duration_ms': root_span.get('duration', 0) / 1000
-            })
-        
-        if self._check_concurrency(root_span_dicts):
-            return max(root_values)
-        else:
-            return sum(root_values)
-
-    def _aggregate_span_recursive(self, span: Dict[str, Any], 
-                                 span_lookup: Dict[str, Dict[str, Any]], 
-                                 critical_patterns: List[str]) -> float:
-        """Recursively aggregate span value from children up using complete hierarchy."""
-        span_id = span['id']
-        span_name = span.get('name', '').lower()
-        
-        # Find ALL children (not just critical ones)
-        children = [s for s in span_lookup.values() if s.get('parentId') == span_id]
+            return root_values[0] / 1000  # Convert to ms
         
-        # Recursively get values from ALL children
-        child_values = []
-        for child in children:
-            child_value = self._aggregate_span_recursive(child, span_lookup, critical_patterns)
-            child_values.append(child_value)
-        
-        # Determine this span's value
-        if any(span_name.startswith(pattern) for pattern in critical_patterns):
-            # This is a critical span - use its duration
-            span_value = span.get('duration', 0) / 1000  # Convert to ms
-        else:
-            # This is not a critical span - value comes from children only
-            span_value = 0
-        
-        # Aggregate children values with this span's value
-        all_values = [span_value] + child_values
-        
-        if len(all_values) == 1:
-            return all_values[0]
-        
-        # Check concurrency among children - only consider children that have critical values
-        critical_children = []
-        for i, child in enumerate(children):
-            if child_values[i] > 0:  # Only consider children that contribute to critical I/O
-                critical_children.append(child)
-        
-        if len(critical_children) <= 1:
-            # No critical children or single critical child - just add to span value
-            return sum(all_values)
-        
-        # Create child span dictionaries for concurrency check using only critical children
-        child_span_dicts = []
-        for child in critical_children:
-            child_span_dicts.append({
-                'timestamp': child.get('timestamp', 0) / 1000,
-                'duration_ms': child.get('duration', 0) / 1000
-            })
-        
-        # Check concurrency among critical children only
-        if self._check_concurrency(child_span_dicts):
-            # Critical children are concurrent - take max of critical children values, then add span value
-            critical_values = [child_values[i] for i, child in enumerate(children) if child_values[i] > 0]
-            children_aggregated = max(critical_values) if critical_values else 0
-        else:
-            # Critical children are sequential - sum critical children values, then add span value
-            critical_values = [child_values[i] for i, child in enumerate(children) if child_values[i] > 0]
-            children_aggregated = sum(critical_values)
-        
-        return span_value + children_aggregated
+        # Concurrent root spans contribute their max, sequential ones their sum
+        if not hierarchy.roots_overlap:
+            return sum(root_values) / 1000
+
+        timestamps, durations = columns.timestamps, columns.durations
+        return self._combine_siblings([
+            (timestamps[root], durations[root], value) for root, value in zip(root_rows, root_values)
+        ]) / 1000
 
     
     def get_ai_token_usage(self) -> List[Dict[str, Any]]:
         """Calculate AI token usage per iteration (trace)."""
         token_usage_values = []
 
-        for trace in self.traces:
+        for trace, columns in zip(self.traces, self._columns):
             # Only consider traces that have benchmark HTTP requests
-            if not self._is_benchmark_trace(trace):
+            if not columns.is_benchmark:
                 continue
 
-            trace_id = trace[0].get('traceId', '') if trace else ''
-            total_tokens = 0
-            input_tokens = 0
-            output_tokens = 0
-
-            for span in trace:
-                if ('name' in span and 'tags' in span and
-                    span['name'].lower().startswith('chat')):
-
-                    # Extract total tokens
-                    if 'gen_ai.usage.total_tokens' in span['tags']:
-                        try:
-                            token_count = int(span['tags']['gen_ai.usage.total_tokens'])
-                            total_tokens += token_count
-                        except (ValueError, TypeError):
-                            continue
-
-                    # Extract input tokens
-                    if 'gen_ai.usage.input_tokens' in span['tags']:
-                        try:
-                            input_token_count = int(span['tags']['gen_ai.usage.input_tokens'])
-                            input_tokens += input_token_count
-                        except (ValueError, TypeError):
-                            continue
-
-                    # Extract output tokens
-                    if 'gen_ai.usage.output_tokens' in span['tags']:
-                        try:
-                            output_token_count = int(span['tags']['gen_ai.usage.output_tokens'])
-                            output_tokens += output_token_count
-                        except (ValueError, TypeError):
-                            continue
-
             token_usage_values.append({
-                'trace_id': trace_id,
-                'total_tokens': total_tokens,
-                'input_tokens': input_tokens,
-                'output_tokens': output_tokens,
-                'ai_spans_with_tokens': len([
-                    s for s in trace
-                    if 'name' in s and 'tags' in s and
-                       s['name'].lower().startswith('chat') and
-                       'gen_ai.usage.total_tokens' in s.get('tags', {})
-                ])
+                'trace_id': trace[0].get('traceId', '') if trace else '',
+                'total_tokens': columns.total_tokens,
+                'input_tokens': columns.input_tokens,
+                'output_tokens': columns.output_tokens,
+                'ai_spans_with_tokens': columns.token_spans
             })
 
         return token_usage_values
@@ -4,9 +4,32 @@ Trace Reporter Module
 Handles generating reports from trace analysis results.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from array import array
 from datetime import datetime
 import json
+import string
+
+from trace_parser import SpanRecord
+from trace_statistics import Aggregate
+
+
+# Fixed skeleton of the markdown summary; only the per-report blocks are filled in
+_SUMMARY_TEMPLATE = string.Template(
+    "# Trace Analysis Report\n"
+    "Generated: $generated\n"
+    "\n"
+    "## Executive Summary\n\n"
+    "$summary_block"
+    "## Individual Request Timings\n\n"
+    "$timings_block"
+    "## Statistical Analysis\n\n"
+    "$statistics_block"
+    "## Task Breakdown Analysis\n\n"
+    "$span_blocks"
+    "## Performance Insights\n\n"
+    "$insights_block"
+)
 
 
 class TraceReporter:
@@ -14,11 +37,13 @@ class TraceReporter:
     
     def __init__(self):
         self.report_data = {}
+        # Duration aggregates per span list, keyed by id() and cleared when each report returns
+        self._stats_cache: Dict[int, Tuple[List[SpanRecord], Aggregate]] = {}
     
     def generate_summary_report(self, 
                             http_requests: List[Dict[str, Any]], 
-                            benchmark_requests: List[Dict[str, Any]],
-                            span_analyses: Dict[str, List[Dict[str, Any]]]) -> str:
+                            benchmark_requests: List[SpanRecord],
+                            span_analyses: Dict[str, List[SpanRecord]]) -> str:
         """
         Generate a comprehensive summary report.
         
@@ -32,90 +57,76 @@ class TraceReporter:
         """
         from trace_statistics import TraceStatistics
         
-        lines = []
-        lines.append("# Trace Analysis Report")
-        lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append("")
-        
-        # Executive Summary
-        lines.append("## Executive Summary")
-        lines.append("")
-        
-        if benchmark_requests:
-            durations = [req['duration_ms'] for req in benchmark_requests]
-            stats = TraceStatistics.calculate_basic_stats(durations)
-            cv = TraceStatistics.calculate_coefficient_of_variation(durations)
-            
-            lines.append(f"- **Benchmark Requests**: {len(benchmark_requests)} iterations")
-            lines.append(f"- **Average Duration**: {stats['mean']:.2f}ms")
-            lines.append(f"- **Duration Range**: {stats['min']:.2f}ms - {stats['max']:.2f}ms")
-            lines.append(f"- **Performance Stability**: {self._get_stability_rating(cv)} (CV: {cv:.1f}%)")
-            lines.append("")
-        
-        # Individual Request Timings
-        lines.append("## Individual Request Timings")
-        lines.append("")
-        
-        if benchmark_requests:
-            lines.append("| Iteration | Request | Duration (ms) | Timestamp (μs) |")
-            lines.append("|-----------|---------|---------------|----------------|")
+        try:
+            # All benchmark-dependent sections are built in one block; without benchmark
+            # requests their headings are written with empty bodies
+            benchmark_stats = None
+            summary_block = timings_block = statistics_block = ""
+            if benchmark_requests:
+                # Benchmark durations are summarized once and shared by every section
+                benchmark_stats = self._duration_stats(benchmark_requests)
+                stats = TraceStatistics.calculate_basic_stats(benchmark_stats)
+                cv = TraceStatistics.calculate_coefficient_of_variation(benchmark_stats)
+                formatted_stats = TraceStatistics.format_duration_stats(benchmark_stats)
+                percentiles = TraceStatistics.calculate_percentiles(benchmark_stats)
             
-            for i, req in enumerate(benchmark_requests, 1):
-                lines.append(f"| {i} | {req['span_name']} | {req['duration_ms']:.2f} | {req['timestamp']:.0f} |")
-            lines.append("")
+                summary_block = (
+                    f"- **Benchmark Requests**: {len(benchmark_requests)} iterations\n"
+                    f"- **Average Duration**: {stats['mean']:.2f}ms\n"
+                    f"- **Duration Range**: {stats['min']:.2f}ms - {stats['max']:.2f}ms\n"
+                    f"- **Performance Stability**: {self._get_stability_rating(cv)} (CV: {cv:.1f}%)\n"
+                    "\n"
+                )
+                timings_block = (
+                    "| Iteration | Request | Duration (ms) | Timestamp (μs) |\n"
+                    "|-----------|---------|---------------|----------------|\n"
+                    + "".join(
+                        f"| {i} | {req.span_name} | {req.duration_ms:.2f} | {req.timestamp:.0f} |\n"
+                        for i, req in enumerate(benchmark_requests, 1)
+                    )
+                    + "\n"
+                )
+                statistics_block = (
+                    "### Benchmark Request Statistics\n\n"
+                    + "".join(
+                        f"- **{key.replace('_', ' ').title()}**: {value}\n" for key, value in formatted_stats.items()
+                    )
+                    + "\n### Percentiles\n\n"
+                    + "".join(f"- **{p.upper()}**: {value:.2f}ms\n" for p, value in percentiles.items())
+                    + "\n"
+                )
         
-        # Statistical Analysis
-        lines.append("## Statistical Analysis")
-        lines.append("")
+            span_stats = {}
+            span_blocks = []
+            for span_name, durations in self._span_type_aggregates(span_analyses).items():
+                stats = span_stats[span_name] = TraceStatistics.calculate_basic_stats(durations)
+                span_blocks.append(
+                    f"### {span_name}\n"
+                    "\n"
+                    f"- **Occurrences**: {stats['count']}\n"
+                    f"- **Average**: {stats['mean']:.2f}ms\n"
+                    f"- **Range**: {stats['min']:.2f}ms - {stats['max']:.2f}ms\n"
+                    "\n"
+                )
         
-        if benchmark_requests:
-            durations = [req['duration_ms'] for req in benchmark_requests]
-            formatted_stats = TraceStatistics.format_duration_stats(durations)
-            
-            lines.append("### Benchmark Request Statistics")
-            lines.append("")
-            for key, value in formatted_stats.items():
-                lines.append(f"- **{key.replace('_', ' ').title()}**: {value}")
-            lines.append("")
-            
-            # Percentiles
-            percentiles = TraceStatistics.calculate_percentiles(durations)
-            lines.append("### Percentiles")
-            lines.append("")
-            for p, value in percentiles.items():
-                lines.append(f"- **{p.upper()}**: {value:.2f}ms")
-            lines.append("")
-        
-        # Task Breakdown Analysis
-        lines.append("## Task Breakdown Analysis")
-        lines.append("")
-        
-        for span_name, spans in span_analyses.items():
-            if spans:
-                durations = [span['duration_ms'] for span in spans]
-                stats = TraceStatistics.calculate_basic_stats(durations)
-                
-                lines.append(f"### {span_name}")
-                lines.append("")
-                lines.append(f"- **Occurrences**: {len(spans)}")
-                lines.append(f"- **Average**: {stats['mean']:.2f}ms")
-                lines.append(f"- **Range**: {stats['min']:.2f}ms - {stats['max']:.2f}ms")
-                lines.append("")
-        
-        # Performance Insights
-        lines.append("## Performance Insights")
-        lines.append("")
-        insights = self._generate_insights(benchmark_requests, span_analyses)
-        for insight in insights:
-            lines.append(f"- {insight}")
-        lines.append("")
-        
-        return "\n".join(lines)
+            insights = self._generate_insights(benchmark_requests, span_analyses, benchmark_stats, span_stats)
+        
+            return _SUMMARY_TEMPLATE.substitute(
+                generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                summary_block=summary_block,
+                timings_block=timings_block,
+                statistics_block=statistics_block,
+                span_blocks="".join(span_blocks),
+                insights_block="".join(f"- {insight}\n" for insight in insights)
+            )
+        finally:
+            self._stats_cache.clear()
     
     def generate_json_report(self, 
                            http_requests: List[Dict[str, Any]], 
-                           benchmark_requests: List[Dict[str, Any]],
-                           span_analyses: Dict[str, List[Dict[str, Any]]]) -> str:
+                           benchmark_requests: List[SpanRecord],
+                           span_analyses: Dict[str, List[SpanRecord]],
+                           indent: bool = True) -> str:
         """
         Generate a JSON report for programmatic consumption.
         
@@ -123,41 +134,84 @@ class TraceReporter:
             http_requests: All HTTP request spans
             benchmark_requests: Benchmark-specific requests
             span_analyses: Analysis of different span types
+            indent: Pretty-print with two-space indentation; pass False for compact output
             
         Returns:
             JSON formatted report string
         """
+        report = self.generate_json_object(http_requests, benchmark_requests, span_analyses)
+        if indent:
+            return json.dumps(report, indent=2)
+        return json.dumps(report, separators=(',', ':'))
+    
+    def generate_json_object(self, 
+                           http_requests: List[Dict[str, Any]], 
+                           benchmark_requests: List[SpanRecord],
+                           span_analyses: Dict[str, List[SpanRecord]]) -> Dict[str, Any]:
+        """
+        Build the JSON report as a dictionary, without serializing it.
+        
+        Args:
+            http_requests: All HTTP request spans
+            benchmark_requests: Benchmark-specific requests
+            span_analyses: Analysis of different span types
+            
+        Returns:
+            Report dictionary ready for json.dump
+        """
         from trace_statistics import TraceStatistics
         
-        report = {
-            'metadata': {
-                'generated_at': datetime.now().isoformat(),
-                'total_http_requests': len(http_requests),
-                'benchmark_requests': len(benchmark_requests)
-            },
-            'benchmark_requests': benchmark_requests,
-            'span_analyses': span_analyses
-        }
+        try:
+            report = {
+                'metadata': {
+                    'generated_at': datetime.now().isoformat(),
+                    'total_http_requests': len(http_requests),
+                    'benchmark_requests': len(benchmark_requests)
+                },
+                'benchmark_requests': [req.to_dict() for req in benchmark_requests],
+                'span_analyses': {
+                    span_name: [span.to_dict() for span in spans]
+                    for span_name, spans in span_analyses.items()
+                }
+            }
         
-        # Add statistics for benchmark requests
-        if benchmark_requests:
-            durations = [req['duration_ms'] for req in benchmark_requests]
-            report['benchmark_statistics'] = TraceStatistics.calculate_basic_stats(durations)
-            report['benchmark_percentiles'] = TraceStatistics.calculate_percentiles(durations)
-            report['performance_stability'] = TraceStatistics.analyze_performance_stability(durations)
-        
-        # Add statistics for each span type
-        report['span_statistics'] = {}
-        for span_name, spans in span_analyses.items():
-            if spans:
-                durations = [span['duration_ms'] for span in spans]
+            # Add statistics for benchmark requests
+            if benchmark_requests:
+                durations = self._duration_stats(benchmark_requests)
+                report['benchmark_statistics'] = TraceStatistics.calculate_basic_stats(durations)
+                report['benchmark_percentiles'] = TraceStatistics.calculate_percentiles(durations)
+                report['performance_stability'] = TraceStatistics.analyze_performance_stability(durations)
+        
+            # Add statistics for each span type
+            report['span_statistics'] = {}
+            for span_name, durations in self._span_type_aggregates(span_analyses).items():
                 report['span_statistics'][span_name] = {
                     'basic_stats': TraceStatistics.calculate_basic_stats(durations),
                     'percentiles': TraceStatistics.calculate_percentiles(durations),
                     'stability': TraceStatistics.analyze_performance_stability(durations)
                 }
         
-        return json.dumps(report, indent=2)
+            return report
+        finally:
+            self._stats_cache.clear()
+    
+    def _duration_stats(self, spans: List[SpanRecord]) -> Aggregate:
+        """Aggregate span durations, reusing the aggregate for a span list already seen in this report."""
+        cached = self._stats_cache.get(id(spans))
+        if cached is not None and cached[0] is spans:
+            return cached[1]
+        
+        from trace_statistics import TraceStatistics
+        stats = TraceStatistics.aggregate(array('d', (span.duration_ms for span in spans)))
+        self._stats_cache[id(spans)] = (spans, stats)
+        return stats
+    
+    def _span_type_aggregates(self, span_analyses: Dict[str, List[SpanRecord]]) -> Dict[str, Aggregate]:
+        """Duration aggregate of each non-empty span type."""
+        return {
+            span_name: self._duration_stats(spans)
+            for span_name, spans in span_analyses.items() if spans
+        }
     
     def _get_stability_rating(self, cv: float) -> str:
         """Get stability rating based on coefficient of variation."""
@@ -171,40 +225,42 @@ class TraceReporter:
             return "Poor"
     
     def _generate_insights(self, 
-                         benchmark_requests: List[Dict[str, Any]], 
-                         span_analyses: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+                         benchmark_requests: List[SpanRecord], 
+                         span_analyses: Dict[str, List[SpanRecord]],
+                         benchmark_stats: Optional[Aggregate] = None,
+                         span_stats: Optional[Dict[str, Dict[str, float]]] = None) -> List[str]:
         """Generate performance insights from the data."""
         insights = []
         
         if not benchmark_requests:
             return ["No benchmark requests found for analysis"]
         
-        durations = [req['duration_ms'] for req in benchmark_requests]
+        from trace_statistics import TraceStatistics
+        if benchmark_stats is None:
+            benchmark_stats = self._duration_stats(benchmark_requests)
         
         # Performance consistency
-        from trace_statistics import TraceStatistics
-        cv = TraceStatistics.calculate_coefficient_of_variation(durations)
+        cv = TraceStatistics.calculate_coefficient_of_variation(benchmark_stats)
         
         if cv < 10:
             insights.append("Performance is highly consistent across iterations")
         elif cv > 30:
             insights.append("High performance variability detected - investigate potential causes")
         
-        # Identify slowest operations
-        slowest_spans = []
-        for span_name, spans in span_analyses.items():
-            if spans:
-                avg_duration = sum(span['duration_ms'] for span in spans) / len(spans)
-                slowest_spans.append((span_name, avg_duration))
-        
-        slowest_spans.sort(key=lambda x: x[1], reverse=True)
+        # Identify slowest operation from the per-span-type means
+        if span_stats is None:
+            span_stats = {
+                span_name: {'mean': durations.mean}
+                for span_name, durations in self._span_type_aggregates(span_analyses).items()
+            }
+        slowest = max(span_stats.items(), key=lambda item: item[1]['mean'], default=None)
         
-        if slowest_spans:
-            insights.append(f"Slowest operation: {slowest_spans[0][0]} (avg: {slowest_spans[0][1]:.2f}ms)")
+        if slowest:
+            insights.append(f"Slowest operation: {slowest[0]} (avg: {slowest[1]['mean']:.2f}ms)")
         
         # Performance range analysis
-        if len(durations) >= 2:
-            range_ratio = max(durations) / min(durations)
+        if benchmark_stats.n >= 2:
+            range_ratio = benchmark_stats.max / benchmark_stats.min
             if range_ratio > 2:
                 insights.append(f"Significant performance variation detected ({range_ratio:.1f}x difference between fastest and slowest)")
         
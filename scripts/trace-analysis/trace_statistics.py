@@ -4,25 +4,111 @@ Trace Statistics Module
 Handles statistical analysis of trace data.
 """
 
+import math
 import statistics
-from typing import List, Dict, Any
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Dict, Any, Iterable, Sequence, Tuple, Union
+
+
+@dataclass(slots=True, frozen=True)
+class Aggregate:
+    """Summary of a list of values, computed once and shared by the statistics helpers."""
+    values: Sequence[float]
+    sorted_values: Sequence[float]
+    n: int
+    mean: float
+    variance: float
+    std_dev: float
+    min: float
+    max: float
+
+    @property
+    def median(self) -> float:
+        """Median of the values, read from the sorted copy."""
+        mid = self.n // 2
+        if self.n % 2:
+            return self.sorted_values[mid]
+        return (self.sorted_values[mid - 1] + self.sorted_values[mid]) / 2
+
+    @classmethod
+    def from_values(cls, values: Sequence[float]) -> 'Aggregate':
+        """Compute the aggregate of a list of values; lists and arrays are kept, not copied."""
+        if isinstance(values, array):
+            sorted_values = array(values.typecode, sorted(values))
+        else:
+            if not isinstance(values, list):
+                values = list(values)
+            sorted_values = sorted(values)
+        n = len(values)
+        if not n:
+            return cls(values, sorted_values, 0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+        # Float arithmetic in C; unlike the exact Fraction arithmetic of
+        # statistics.mean/variance, results may differ in the last ulp
+        mean = statistics.fmean(values)
+        variance = math.fsum((value - mean) ** 2 for value in values) / (n - 1) if n > 1 else 0.0
+        return cls(
+            values=values,
+            sorted_values=sorted_values,
+            n=n,
+            mean=mean,
+            variance=variance,
+            std_dev=math.sqrt(variance),
+            min=sorted_values[0],
+            max=sorted_values[-1]
+        )
+
+
+Values = Union[Sequence[float], Aggregate]
+
+
+def _as_aggregate(values: Values) -> Aggregate:
+    """Reuse a precomputed aggregate, or compute one from raw values."""
+    if isinstance(values, Aggregate):
+        return values
+    return Aggregate.from_values(values)
+
+
+def _interpolate(sorted_values: List[float], index: float) -> float:
+    """Value at a fractional position of sorted values, interpolating linearly between neighbours."""
+    lower_index = int(index)
+    lower = sorted_values[lower_index]
+    if index == lower_index:
+        return lower
+    return lower + (sorted_values[lower_index + 1] - lower) * (index - lower_index)
 
 
 class TraceStatistics:
     """Handles statistical calculations for trace data."""
     
     @staticmethod
-    def calculate_basic_stats(values: List[float]) -> Dict[str, float]:
+    def aggregate(values: Sequence[float]) -> Aggregate:
+        """
+        Precompute the aggregate of a list of values for repeated use.
+        
+        Args:
+            values: List of numeric values, or an array('d') to keep them packed
+            
+        Returns:
+            Aggregate accepted by every statistics helper in place of the values
+        """
+        return Aggregate.from_values(values)
+    
+    @staticmethod
+    def calculate_basic_stats(values: Values) -> Dict[str, float]:
         """
         Calculate basic statistics for a list of values.
         
         Args:
-            values: List of numeric values
+            values: List of numeric values or a precomputed aggregate
             
         Returns:
             Dictionary containing basic statistics
         """
-        if not values:
+        agg = _as_aggregate(values)
+        if not agg.n:
             return {
                 'count': 0,
                 'mean': 0.0,
@@ -35,83 +121,134 @@ class TraceStatistics:
             }
         
         return {
-            'count': len(values),
-            'mean': statistics.mean(values),
-            'median': statistics.median(values),
-            'min': min(values),
-            'max': max(values),
-            'range': max(values) - min(values),
-            'std_dev': statistics.stdev(values) if len(values) > 1 else 0.0,
-            'variance': statistics.variance(values) if len(values) > 1 else 0.0
+            'count': agg.n,
+            'mean': agg.mean,
+            'median': agg.median,
+            'min': agg.min,
+            'max': agg.max,
+            'range': agg.max - agg.min,
+            'std_dev': agg.std_dev,
+            'variance': agg.variance
+        }
+    
+    @staticmethod
+    def stream_stats(values: Iterable[float]) -> Dict[str, float]:
+        """
+        Calculate count, mean, spread and range in one pass without materializing the values.
+        
+        Uses Welford's online algorithm, so memory stays constant however many values are streamed.
+        
+        Args:
+            values: Iterable of numeric values, e.g. a generator over spans
+            
+        Returns:
+            Dictionary with count, mean, m2 (sum of squared deviations), min, max, range,
+            sample variance, standard deviation and coefficient of variation (cv, in percent)
+        """
+        count = 0
+        mean = m2 = 0.0
+        lowest = highest = 0.0
+        
+        for value in values:
+            count += 1
+            if count == 1:
+                lowest = highest = value
+            elif value < lowest:
+                lowest = value
+            elif value > highest:
+                highest = value
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+        
+        variance = m2 / (count - 1) if count > 1 else 0.0
+        std_dev = math.sqrt(variance)
+        return {
+            'count': count,
+            'mean': mean,
+            'm2': m2,
+            'min': lowest,
+            'max': highest,
+            'range': highest - lowest,
+            'variance': variance,
+            'std_dev': std_dev,
+            'cv': (std_dev / mean) * 100 if mean != 0 else 0.0
         }
     
     @staticmethod
-    def calculate_percentiles(values: List[float], percentiles: List[float] = None) -> Dict[str, float]:
+    def calculate_percentiles(values: Values, percentiles: List[float] = None) -> Dict[str, float]:
         """
         Calculate percentiles for a list of values.
         
         Args:
-            values: List of numeric values
+            values: List of numeric values or a precomputed aggregate
             percentiles: List of percentiles to calculate (default: [50, 90, 95, 99])
             
         Returns:
             Dictionary containing percentile values
         """
+        sorted_values = _as_aggregate(values).sorted_values
+        
         if percentiles is None:
-            percentiles = [50, 90, 95, 99]
+            return TraceStatistics._p_default(sorted_values)
         
-        if not values:
+        if not sorted_values:
             return {f'p{p}': 0.0 for p in percentiles}
         
-        sorted_values = sorted(values)
-        result = {}
-        
-        for p in percentiles:
-            index = (p / 100) * (len(sorted_values) - 1)
-            if index.is_integer():
-                result[f'p{p}'] = sorted_values[int(index)]
-            else:
-                lower = sorted_values[int(index)]
-                upper = sorted_values[int(index) + 1]
-                result[f'p{p}'] = lower + (upper - lower) * (index - int(index))
+        return TraceStatistics._percentiles_from_sorted(sorted_values, percentiles)
+    
+    @staticmethod
+    def _p_default(sorted_values: List[float]) -> Dict[str, float]:
+        """P50/P90/P95/P99 of already sorted values, with the positions folded in."""
+        if not sorted_values:
+            return {'p50': 0.0, 'p90': 0.0, 'p95': 0.0, 'p99': 0.0}
         
-        return result
+        last = len(sorted_values) - 1
+        return {
+            'p50': _interpolate(sorted_values, 0.5 * last),
+            'p90': _interpolate(sorted_values, 0.9 * last),
+            'p95': _interpolate(sorted_values, 0.95 * last),
+            'p99': _interpolate(sorted_values, 0.99 * last)
+        }
+    
+    @staticmethod
+    def _percentiles_from_sorted(sorted_values: List[float], percentiles: List[float]) -> Dict[str, float]:
+        """Linearly interpolate percentiles from non-empty, already sorted values."""
+        last = len(sorted_values) - 1
+        return {f'p{p}': _interpolate(sorted_values, (p / 100) * last) for p in percentiles}
     
     @staticmethod
-    def calculate_coefficient_of_variation(values: List[float]) -> float:
+    def calculate_coefficient_of_variation(values: Values) -> float:
         """
         Calculate coefficient of variation (CV).
         
         Args:
-            values: List of numeric values
+            values: List of numeric values or a precomputed aggregate
             
         Returns:
             Coefficient of variation (0.0 if mean is 0)
         """
-        if not values:
+        agg = _as_aggregate(values)
+        if not agg.n or agg.mean == 0:
             return 0.0
         
-        mean = statistics.mean(values)
-        if mean == 0:
-            return 0.0
-        
-        std_dev = statistics.stdev(values) if len(values) > 1 else 0.0
-        return (std_dev / mean) * 100
+        return (agg.std_dev / agg.mean) * 100
     
     @staticmethod
-    def format_duration_stats(durations: List[float], unit: str = 'ms') -> Dict[str, str]:
+    def format_duration_stats(durations: Values, unit: str = 'ms') -> Dict[str, str]:
         """
         Format duration statistics for display.
         
         Args:
-            durations: List of duration values
+            durations: List of duration values or a precomputed aggregate
             unit: Time unit for display ('ms' or 's')
             
         Returns:
             Dictionary with formatted statistics strings
         """
-        stats = TraceStatistics.calculate_basic_stats(durations)
-        cv = TraceStatistics.calculate_coefficient_of_variation(durations)
+        agg = _as_aggregate(durations)
+        stats = TraceStatistics.calculate_basic_stats(agg)
+        cv = TraceStatistics.calculate_coefficient_of_variation(agg)
         
         # Convert to seconds if requested
         if unit == 's':
@@ -131,21 +268,36 @@ class TraceStatistics:
         }
     
     @staticmethod
-    def analyze_performance_stability(durations: List[float]) -> Dict[str, Any]:
+    def _quartiles_from_sorted(sorted_values: List[float]) -> Tuple[float, float]:
+        """Q1 and Q3 of already sorted values, matching statistics.quantiles(n=4)."""
+        # Exclusive method: quartile i sits at position i * (n + 1) / 4, clamped to the data
+        n = len(sorted_values)
+        m = n + 1
+        quartiles = []
+        for i in (1, 3):
+            j = min(max(i * m // 4, 1), n - 1)
+            delta = i * m - j * 4
+            quartiles.append((sorted_values[j - 1] * (4 - delta) + sorted_values[j] * delta) / 4)
+        return quartiles[0], quartiles[1]
+    
+    @staticmethod
+    def analyze_performance_stability(durations: Values) -> Dict[str, Any]:
         """
         Analyze performance stability and categorize results.
         
         Args:
-            durations: List of duration values
+            durations: List of duration values or a precomputed aggregate
             
         Returns:
             Dictionary with stability analysis
         """
-        if not durations:
+        agg = _as_aggregate(durations)
+        if not agg.n:
             return {'stability': 'unknown', 'reason': 'no data'}
         
-        cv = TraceStatistics.calculate_coefficient_of_variation(durations)
-        stats = TraceStatistics.calculate_basic_stats(durations)
+        durations = agg.values
+        cv = TraceStatistics.calculate_coefficient_of_variation(agg)
+        stats = TraceStatistics.calculate_basic_stats(agg)
         
         # Categorize stability
         if cv < 10:
@@ -162,22 +314,27 @@ class TraceStatistics:
             reason = 'very high variability (CV ≥ 30%)'
         
         # Check for outliers
-        q1 = statistics.quantiles(durations, n=4)[0] if len(durations) >= 4 else min(durations)
-        q3 = statistics.quantiles(durations, n=4)[2] if len(durations) >= 4 else max(durations)
+        if agg.n >= 4:
+            q1, q3 = TraceStatistics._quartiles_from_sorted(agg.sorted_values)
+        else:
+            q1, q3 = agg.min, agg.max
         iqr = q3 - q1
         lower_bound = q1 - 1.5 * iqr
         upper_bound = q3 + 1.5 * iqr
         
-        outliers = [d for d in durations if d < lower_bound or d > upper_bound]
+        # Count outliers on the sorted copy; list their values in original order
+        sorted_values = agg.sorted_values
+        outlier_count = bisect_left(sorted_values, lower_bound) + agg.n - bisect_right(sorted_values, upper_bound)
+        outliers = [d for d in durations if d < lower_bound or d > upper_bound] if outlier_count else []
         
         return {
             'stability': stability,
             'reason': reason,
             'coefficient_of_variation': cv,
             'outliers': {
-                'count': len(outliers),
+                'count': outlier_count,
                 'values': outliers,
-                'percentage': (len(outliers) / len(durations)) * 100
+                'percentage': (outlier_count / agg.n) * 100
             },
             'stats': stats
         }